@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from enum import Enum
+from typing import Optional
+
 import typer
 from rich.console import Console
 from rich.theme import Theme
@@ -22,12 +25,21 @@ client_app = typer.Typer(name="client", help="Client commands")
 app.add_typer(server_app)
 app.add_typer(client_app)
 
+class Encoder(str, Enum):
+    """Mirrors akita.server.ENCODERS."""
+    auto = "auto"
+    libx264 = "libx264"
+    vaapi = "vaapi"
+    nvenc = "nvenc"
+
 @server_app.command("start")
 def start_server(
     nickname: str = typer.Option("Akita_Server_Main", "--nickname", "-n", help="Server Nickname"),
     res: str = typer.Option("1280x720", "--res", "-r", help="Resolution"),
     fps: int = typer.Option(20, help="Frames per second"),
     max_clients: int = typer.Option(0, help="Max clients (0 for unlimited)"),
+    encoder: Encoder = typer.Option(Encoder.auto, help="Video encoder; auto picks VAAPI or NVENC when available"),
+    ffmpeg_grace: int = typer.Option(30, help="Seconds to keep FFmpeg running after the last client leaves (0 = stop at once)"),
     web_dashboard: bool = typer.Option(True, "--web/--no-web", help="Enable the web dashboard")
 ):
     """Start the Akita Wayland Stream Server"""
@@ -35,7 +47,7 @@ def start_server(
     
     # We use a dataclass to mock the argparse namespace that the original server expects
     class Args:
-        def __init__(self, nickname, res, fps, max_clients):
+        def __init__(self, nickname, res, fps, max_clients, encoder, ffmpeg_grace):
             self.app_name = "AkitaAdStreamServer"
             self.aspect = "video_stream/ad_feed"
             self.nickname = nickname
@@ -44,11 +56,13 @@ def start_server(
             self.crf = 28
             self.gop_seconds = 2
             self.preset = "ultrafast"
+            self.encoder = encoder.value
             self.max_clients = max_clients
             self.heartbeat_interval = 15
             self.heartbeat_timeout = 45
+            self.ffmpeg_grace = ffmpeg_grace
 
-    args = Args(nickname, res, fps, max_clients)
+    args = Args(nickname, res, fps, max_clients, encoder, ffmpeg_grace)
     
     from akita.server import WaylandStreamServer
     server = WaylandStreamServer(args)
@@ -68,20 +82,15 @@ def start_server(
 
 @client_app.command("connect")
 def connect_client(
-    aspect: str = typer.Option("video_stream/ad_feed", help="Reticulum Aspect")
+    aspect: str = typer.Option("video_stream/ad_feed", help="Reticulum Aspect"),
+    max_buffer_kb: int = typer.Option(1024, help="Max video queued for ffplay before dropping oldest data (KB)"),
+    writer_cpu: Optional[int] = typer.Option(None, help="Pin the ffplay writer thread to this CPU (Linux)")
 ):
     """Start the client and connect to available streams"""
     console.print(Panel("Starting Akita Client...", style="info", border_style="accent"))
     
-    class Args:
-        def __init__(self, aspect):
-            self.app_name = "AkitaAdStreamClient"
-            self.aspect = aspect
-            self.timeout = 30
-            self.reconnect_delay = 5
-
-    args = Args(aspect)
-    from akita.client import StreamClient
+    from akita.client import ClientArgs, StreamClient
+    args = ClientArgs(aspect=aspect, max_buffer_kb=max_buffer_kb, writer_cpu=writer_cpu)
     client = StreamClient(args)
     client.start()
 
@@ -9,17 +9,70 @@ import subprocess
 import threading
 import time
 import os
+import sys
+import select
+import selectors
+import socket
+import signal
 import argparse
 import logging
+import dataclasses
+import collections
+import json
+from typing import NamedTuple, Optional
+import ctypes
 
 # --- Configuration ---
 APP_NAME = "AkitaAdStreamClient"
 DEFAULT_ASPECT = "video_stream/ad_feed"
+DEFAULT_MAX_BUFFER_KB = 1024  # Video queued for ffplay beyond this is dropped oldest-first
+LAST_SERVER_FILE = "last_server.json"
+LAST_SERVER_MAX_AGE = 24 * 3600  # Seconds a cached server is tried before waiting for announces
+LAST_SERVER_PATH_TIMEOUT = 5  # Seconds to wait for a path to the cached server before giving up on it
+PENDING_LINK_TIMEOUT = 10  # Seconds a pending link holds off connects from announces
 
 # Messages
 PING_MESSAGE = b"__AKITA_ADS_PING__"
 PONG_MESSAGE = b"__AKITA_ADS_PONG__"
 MAX_CLIENTS_MSG = b"MAX_CLIENTS_REACHED"
+_CONTROL_MSGS = frozenset({PING_MESSAGE, MAX_CLIENTS_MSG})
+_CONTROL_MAX_LEN = max(len(m) for m in _CONTROL_MSGS)
+
+# Announce app_data format: key:value;key:value (only these keys are decoded)
+_APP_DATA_KEYS = frozenset({b"nickname", b"res", b"fps"})
+
+STATS_INTERVAL = 5  # Seconds between throughput log lines
+
+# FFplay
+_FFPLAY_CMD_PREFIX = (
+    'ffplay',
+    '-loglevel', 'error',
+    '-fflags', 'nobuffer',
+    '-flags', 'low_delay',
+    '-probesize', '32',
+    '-analyzeduration', '0',
+    '-max_delay', '0',
+    '-sync', 'ext',
+    '-an', '-sn',
+    '-framedrop',
+    '-window_title',
+)
+
+# FFplay Writer
+WRITE_COALESCE_BYTES = 65536  # Drain to ffplay once this much video is buffered
+WRITE_IDLE_FLUSH = 0.005      # ...or once the oldest queued data is this many seconds old
+WRITER_NICE = -5              # Priority boost for the writer thread (needs CAP_SYS_NICE)
+DROP_LOG_INTERVAL = 1.0       # Minimum seconds between "dropped video" warnings
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+if hasattr(os, 'writev'):
+    _writev = os.writev
+else:
+    def _writev(fd, buffers):
+        return os.write(fd, b''.join(buffers))
 
 logging.basicConfig(
     level=logging.INFO,
@@ -36,18 +89,99 @@ class ClientAnnounceHandler:
     def received_announce(self, destination_hash, announced_identity, app_data):
         self.callback(destination_hash, announced_identity, app_data)
 
+class ClientArgs(NamedTuple):
+    """Immutable client options, built once from the CLI."""
+    app_name: str = APP_NAME
+    aspect: str = DEFAULT_ASPECT
+    timeout: int = 30
+    reconnect_delay: int = 5
+    max_buffer_kb: int = DEFAULT_MAX_BUFFER_KB
+    writer_cpu: Optional[int] = None
+
+@dataclasses.dataclass(frozen=True)
+class ConnState:
+    """Snapshot of the server connection. Replaced as a whole, so readers never see
+    a link paired with another server's info."""
+    link: object = None
+    info: dict = dataclasses.field(default_factory=dict)
+    last_known: tuple = None  # (destination_hash, app_data) of the last link attempt
+    server_id: str = ""       # Pretty hash of the server, formatted once for log lines
+    linked_at: float = 0.0    # time.monotonic() when the link was created
+
 class StreamClient:
+    __slots__ = (
+        'args', 'reticulum', 'rns_identity', 'announce_handler', '_state',
+        '_dest_names', '_aspect_filter', '_reconnect_delay',
+        'ffplay_process', '_ffplay_fd', '_ffplay_gen', 'lock', '_bytes_received', '_shutdown',
+        '_wake_r', '_wake_w', '_pong_q', '_pong_wake', '_connect_lock',
+        '_reconnect_wake', '_app_data_cache', '_dest_cache',
+        '_pending', '_pending_append', '_pending_bytes', '_max_pending', '_dropped_bytes', '_drop_logged_at',
+        '_buf_thresh', '_buf_cond', '_write_lock',
+    )
+
     def __init__(self, args):
         self.args = args
+        # Hoisted out of the announce, link and reconnect callbacks
+        self._dest_names = (args.app_name, args.aspect)
+        self._aspect_filter = f"{args.app_name}.{args.aspect}"
+        self._reconnect_delay = args.reconnect_delay
+        self.reticulum = None
         self.rns_identity = None
         self.announce_handler = None
-        self.server_link = None
+        self._state = ConnState()  # Swapped under self.lock; read without it
         self.ffplay_process = None
-        self.running = False
+        self._ffplay_fd = None  # Raw stdin fd of the current ffplay, cached per connect
+        # Bumped under _buf_cond whenever ffplay is started or stopped. Batches are tagged
+        # with it, so a batch queued for one player is never written to the next one,
+        # even if the new stdin reuses the old fd number.
+        self._ffplay_gen = 0
         
         self.lock = threading.RLock()
-        self.bytes_received = 0
-        self.last_server_info = {}
+        # Held only while a new server link is being created; callers never wait on it
+        self._connect_lock = threading.Lock()
+        # Fixed-width counter, written only by the writer thread and read approximately
+        self._bytes_received = ctypes.c_uint64(0)
+        # Cleared by start() and set by stop(); the single source of truth for running.
+        # Waiters block on it instead of polling, so they wake immediately on stop().
+        self._shutdown = threading.Event()
+        self._shutdown.set()
+        # Wakes the main event loop when ffplay changes or on shutdown
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._app_data_cache = (None, {})  # (raw app_data, parsed dict)
+        self._dest_cache = {}  # Map[destination_hash, RNS.Destination]
+
+        # PONG replies are sent off the RNS callback thread by _pong_sender
+        self._pong_q = collections.deque()
+        self._pong_wake = threading.Event()
+
+        # Reconnects run on one long-lived worker instead of a Timer thread each
+        self._reconnect_wake = threading.Event()
+
+        # Video data plane: packets are queued here and gather-written by _writer_loop
+        self._pending = collections.deque()
+        self._pending_append = self._pending.append  # Bound once for the packet path
+        self._pending_bytes = 0
+        self._max_pending = args.max_buffer_kb * 1024
+        self._dropped_bytes = 0
+        self._drop_logged_at = 0.0
+        self._buf_thresh = WRITE_COALESCE_BYTES
+        self._buf_cond = threading.Condition(threading.Lock())
+        # Guards writes to ffplay's stdin. Lock order: self.lock, then _write_lock
+        self._write_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return not self._shutdown.is_set()
+
+    @property
+    def server_link(self):
+        return self._state.link
+
+    @property
+    def last_server_info(self):
+        return self._state.info
 
     def initialize_rns(self):
         self.reticulum = RNS.Reticulum()
@@ -63,197 +197,561 @@ class StreamClient:
             logger.info("Created new Identity.")
 
     def _get_ffplay_cmd(self, title):
-        return [
-            'ffplay',
-            '-loglevel', 'error',
-            '-fflags', 'nobuffer',
-            '-flags', 'low_delay',
-            '-probesize', '32',
-            '-sync', 'ext',
-            '-window_title', title,
-            '-'
-        ]
+        return [*_FFPLAY_CMD_PREFIX, title, '-']
 
     def _start_ffplay(self, server_name):
         with self.lock:
             self._stop_ffplay() # Ensure clean slate
+            self._reset_pending()
             
             title = f"Akita AdStream - {server_name}"
             cmd = self._get_ffplay_cmd(title)
             
             try:
+                # Unbuffered: video goes straight to the fd, stderr is read with os.read.
+                # Own session: a terminal Ctrl-C reaches only us, and _stop_ffplay ends it.
                 self.ffplay_process = subprocess.Popen(
-                    cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+                    cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0,
+                    close_fds=True, start_new_session=True
                 )
+                # The writer thread must never block on a stalled player
+                self._ffplay_fd = self.ffplay_process.stdin.fileno()
+                os.set_blocking(self._ffplay_fd, False)
                 
-                # Monitor thread for ffplay errors
-                t = threading.Thread(target=self._monitor_ffplay_stderr, args=(self.ffplay_process,), daemon=True)
-                t.start()
+                # Have the main loop start draining ffplay's stderr
+                self._wakeup()
                 
-                logger.info(f"FFplay started (PID: {self.ffplay_process.pid})")
+                logger.info("FFplay started (PID: %d)", self.ffplay_process.pid)
             except FileNotFoundError:
                 logger.critical("FFplay not found! Is ffmpeg installed?")
             except Exception as e:
-                logger.error(f"Failed to start FFplay: {e}")
+                logger.error("Failed to start FFplay: %s", e)
+
+    def _reset_pending(self):
+        """Discards queued video and wakes the writer so it notices the ffplay change."""
+        with self._buf_cond:
+            self._ffplay_gen += 1
+            self._pending.clear()
+            self._pending_bytes = 0
+            self._dropped_bytes = 0
+            self._buf_cond.notify()
 
     def _stop_ffplay(self):
         with self.lock:
             if self.ffplay_process:
+                # Clearing the fd first makes an in-flight writev bail out promptly
+                self._ffplay_fd = None
+                self._reset_pending()
                 try:
                     if self.ffplay_process.stdin:
-                        self.ffplay_process.stdin.close()
+                        with self._write_lock:
+                            self.ffplay_process.stdin.close()
                     self.ffplay_process.terminate()
                     self.ffplay_process.wait(timeout=1)
                 except Exception as e:
-                    logger.debug(f"Graceful ffplay terminate failed, killing process: {e}")
+                    logger.debug("Graceful ffplay terminate failed, killing process: %s", e)
                     try:
                         self.ffplay_process.kill()
                     except Exception as e2:
-                        logger.debug(f"Failed to kill ffplay: {e2}")
+                        logger.debug("Failed to kill ffplay: %s", e2)
                 finally:
                     self.ffplay_process = None
+                    self._wakeup()
 
-    def _monitor_ffplay_stderr(self, process):
+    def _log_ffplay_stderr(self, pid, tail, data):
+        """Logs the complete lines in tail + data and returns the unfinished remainder."""
+        # The pipe is always drained, but skip decoding lines nobody will see
+        if not logger.isEnabledFor(logging.INFO):
+            return b''
+        *lines, tail = (tail + data).split(b'\n')
+        for line in lines:
+            self._log_ffplay_line(pid, line)
+        return tail
+
+    def _log_ffplay_line(self, pid, line):
+        line = line.decode('utf-8', errors='ignore').strip()
+        if line:
+            logger.info("[FFPLAY PID %d]: %s", pid, line)
+
+    def _release_ffplay_stderr(self, sel, process):
         try:
-            for line in iter(process.stderr.readline, b''):
-                if not line:
-                    break
-                logger.info(f"[FFPLAY]: {line.decode('utf-8', errors='ignore').strip()}")
-        except Exception as e:
-            logger.debug(f"FFplay stderr monitor error: {e}", exc_info=True)
-        finally:
-            if process.stderr:
-                try:
-                    process.stderr.close()
-                except Exception:
-                    pass
+            sel.unregister(process.stderr)
+        except (KeyError, ValueError):
+            pass  # Already unregistered at EOF
+        try:
+            process.stderr.close()
+        except Exception:
+            pass
+
+    def _is_connected(self):
+        state = self._state
+        link = state.link
+        if link is None:
+            return False
+        status = link.status
+        if status == RNS.Link.ACTIVE:
+            return True
+        # A pending link only holds off announces for a while, so an unreachable
+        # server cannot keep the client from connecting to the others
+        return status == RNS.Link.PENDING and time.monotonic() - state.linked_at < PENDING_LINK_TIMEOUT
 
     def _on_server_discovered(self, destination_hash, announced_identity, app_data):
-        with self.lock:
-            if self.server_link and self.server_link.status in [RNS.Link.ACTIVE, RNS.Link.PENDING]:
+        # Lock-free fast path: announce storms while connected return here
+        if self._is_connected():
+            return
+        # Only one announce gets to connect; the others bail instead of queueing
+        if not self._connect_lock.acquire(blocking=False):
+            return
+        try:
+            if self._is_connected():
                 return
 
             server_info = self._parse_app_data(app_data)
-            logger.info(f"Discovered: {server_info.get('nickname')} ({server_info.get('res')})")
-            
-            dest = RNS.Destination(
-                announced_identity, RNS.Destination.OUT, RNS.Destination.SINGLE,
-                self.args.app_name, self.args.aspect
-            )
-
-            self.server_link = RNS.Link(dest)
-            self.server_link.set_link_established_callback(self._on_link_established)
-            self.server_link.set_link_closed_callback(self._on_link_closed)
-            self.server_link.set_packet_callback(self._on_packet)
+            server_id = RNS.prettyhexrep(destination_hash)
+            logger.info("Discovered: %s (%s) at %s", server_info.get('nickname'), server_info.get('res'), server_id)
             
-            self.last_server_info = server_info
+            # Reuse the OUT destination when the same server announces again
+            dest = self._dest_cache.get(destination_hash)
+            if dest is None:
+                dest = RNS.Destination(
+                    announced_identity, RNS.Destination.OUT, RNS.Destination.SINGLE,
+                    *self._dest_names
+                )
+                self._dest_cache[destination_hash] = dest
+
+            # Publish the server first so link callbacks always find its info
+            with self.lock:
+                stale = self._state.link  # Still pending past PENDING_LINK_TIMEOUT
+                self._state = ConnState(
+                    info=server_info, last_known=(destination_hash, app_data), server_id=server_id
+                )
+            if stale is not None and stale.status == RNS.Link.PENDING:
+                logger.info("Giving up on pending link; connecting to %s instead.", server_id)
+                try:
+                    stale.teardown()  # Superseded, so its closed callback is ignored
+                except Exception as e:
+                    logger.debug("Failed to tear down pending link: %s", e)
+            link = RNS.Link(dest)
+            link.set_link_established_callback(self._on_link_established)
+            link.set_link_closed_callback(self._on_link_closed)
+            link.set_packet_callback(self._on_packet)
+            with self.lock:
+                self._state = dataclasses.replace(self._state, link=link, linked_at=time.monotonic())
+        finally:
+            self._connect_lock.release()
 
     def _parse_app_data(self, data):
+        if not data:
+            return {}
+        # Servers re-announce the same payload, so reuse the last parse
+        cached_data, cached_info = self._app_data_cache
+        if data == cached_data:
+            return cached_info
+        # Single pass over the raw bytes; only values of known keys are decoded
         info = {}
-        try:
-            parts = data.decode('utf-8').split(';')
-            for p in parts:
-                if ':' in p:
-                    k, v = p.split(':', 1)
-                    info[k] = v
-        except Exception as e:
-            logger.debug(f"Failed to parse app_data: {e}")
+        start, size = 0, len(data)
+        while start < size:
+            end = data.find(b';', start)
+            if end < 0:
+                end = size
+            colon = data.find(b':', start, end)
+            if colon > start:
+                key = data[start:colon]
+                if key in _APP_DATA_KEYS:
+                    info[key.decode('ascii')] = data[colon + 1:end].decode('utf-8', 'replace')
+            start = end + 1
+        self._app_data_cache = (data, info)
         return info
 
+    def _last_server_path(self):
+        return os.path.join(platformdirs.user_data_dir(self.args.app_name), LAST_SERVER_FILE)
+
+    def _save_last_server(self):
+        known = self._state.last_known
+        if known is None:
+            return
+        destination_hash, app_data = known
+        try:
+            with open(self._last_server_path(), "w") as f:
+                json.dump({
+                    "hash": destination_hash.hex(),
+                    "app_data": (app_data or b"").hex(),
+                    "app_name": self.args.app_name,
+                    "aspect": self.args.aspect,
+                    "timestamp": time.time(),
+                }, f)
+        except OSError as e:
+            logger.debug("Failed to save last server: %s", e)
+
+    def _connect_last_server(self):
+        """Links straight to the last server we streamed from, ahead of any announce.
+        Runs on its own thread, in parallel with announce discovery."""
+        try:
+            with open(self._last_server_path(), "r") as f:
+                data = json.load(f)
+            if time.time() - data["timestamp"] > LAST_SERVER_MAX_AGE:
+                return
+            # A different --app-name/--aspect gives the server a different destination hash
+            if (data.get("app_name"), data.get("aspect")) != self._dest_names:
+                logger.debug("Last server was cached for another aspect; ignoring it.")
+                return
+            destination_hash = bytes.fromhex(data["hash"])
+            app_data = bytes.fromhex(data["app_data"])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug("Ignoring unreadable last server cache: %s", e)
+            return
+
+        # Without a path RNS gives the link a timeout of many minutes, so only
+        # link once one is known and leave unreachable servers to the announces
+        if not RNS.Transport.has_path(destination_hash):
+            RNS.Transport.request_path(destination_hash)
+            deadline = time.monotonic() + LAST_SERVER_PATH_TIMEOUT
+            while not RNS.Transport.has_path(destination_hash):
+                if self._shutdown.wait(0.1):
+                    return
+                if time.monotonic() >= deadline:
+                    logger.debug("No path to last server; waiting for announces.")
+                    return
+        identity = RNS.Identity.recall(destination_hash)
+        if identity is None:
+            logger.debug("Last server identity not known yet; waiting for announces.")
+            return
+        logger.info("Trying last known server %s", RNS.prettyhexrep(destination_hash))
+        self._on_server_discovered(destination_hash, identity, app_data)
+
     def _on_link_established(self, link):
-        logger.info("Link established! Starting playback...")
+        logger.info("Link established to %s! Starting playback...", self._state.server_id)
+        self._save_last_server()
         name = self.last_server_info.get('nickname', 'Server')
         self._start_ffplay(name)
 
     def _on_packet(self, message, packet):
-        # Handle Control Messages
-        if message == PING_MESSAGE:
-            # logger.debug("Ping received")
-            try:
-                packet.link.send(PONG_MESSAGE)
-            except Exception as e:
-                logger.debug(f"Failed to send PONG: {e}")
-            return
-        
-        if message == MAX_CLIENTS_MSG:
-            logger.warning("Server full.")
-            packet.link.teardown()
+        # Handle Control Messages (a length check rejects video packets first)
+        if len(message) <= _CONTROL_MAX_LEN and message in _CONTROL_MSGS:
+            if message == PING_MESSAGE:
+                self._pong_q.append(packet.link)
+                self._pong_wake.set()
+            else:
+                logger.warning("Server full.")
+                packet.link.teardown()
             return
 
-        # Handle Video Data
-        with self.lock:
-            if self.ffplay_process and self.ffplay_process.stdin:
+        # Handle Video Data (drained to ffplay by _writer_loop)
+        cond = self._buf_cond
+        with cond:
+            self._pending_append(message)
+            pending = self._pending_bytes + len(message)
+            if pending > self._max_pending:
+                pending = self._drop_oldest(pending)
+            self._pending_bytes = pending
+            # Wake the writer to start its flush window, or to flush a full batch now
+            if pending >= self._buf_thresh or len(self._pending) == 1:
+                cond.notify()
+
+    def _pong_sender(self):
+        """Answers queued PINGs in batches, at most one PONG per link per wakeup."""
+        while not self._shutdown.is_set():
+            self._pong_wake.wait()
+            self._pong_wake.clear()
+            links = {}
+            while self._pong_q:
+                link = self._pong_q.popleft()
+                links[id(link)] = link
+            for link in links.values():
                 try:
-                    self.ffplay_process.stdin.write(message)
-                    self.ffplay_process.stdin.flush()
-                    self.bytes_received += len(message)
-                except BrokenPipeError:
-                    logger.warning("FFplay closed. Tearing down link.")
-                    self._stop_ffplay()
-                    packet.link.teardown()
+                    link.send(PONG_MESSAGE)
                 except Exception as e:
-                    logger.error(f"Write error: {e}")
+                    logger.debug("Failed to send PONG: %s", e)
+
+    def _drop_oldest(self, pending):
+        """Sheds the oldest queued video when ffplay falls behind, keeping playback live.
+        Must be called under self._buf_cond. Returns the new pending byte count."""
+        while pending > self._max_pending and len(self._pending) > 1:
+            dropped = len(self._pending.popleft())
+            pending -= dropped
+            self._dropped_bytes += dropped
+        return pending
+
+    def _writev_all(self, fd, gen, chunks):
+        """Gather-writes chunks to ffplay's non-blocking stdin, handling partial writes.
+        Must be called under self._write_lock."""
+        writev, counter = _writev, self._bytes_received
+        i = 0
+        unwritten = sum(map(len, chunks))
+        while i < len(chunks):
+            if not self.running or gen != self._ffplay_gen:
+                return
+            try:
+                written = writev(fd, chunks[i:i + IOV_MAX])
+            except BlockingIOError:
+                # ffplay is stalled: shed the oldest of this batch too, then wait
+                i, unwritten = self._shed_stalled(chunks, i, unwritten)
+                self._report_drops()
+                if i < len(chunks):
+                    select.select([], [fd], [], 0.1)
+                continue
+            counter.value += written
+            unwritten -= written
+
+            # Skip fully written chunks, then trim the partially written one
+            while i < len(chunks) and written >= len(chunks[i]):
+                written -= len(chunks[i])
+                i += 1
+            if written:
+                chunks[i] = memoryview(chunks[i])[written:]
+
+    def _shed_stalled(self, chunks, i, unwritten):
+        """Drops the oldest unwritten chunks of an in-flight batch while it and the queue
+        behind it exceed --max-buffer-kb, so a stall never holds more than the cap.
+        Returns the updated (i, unwritten)."""
+        with self._buf_cond:
+            excess = unwritten + self._pending_bytes - self._max_pending
+            while excess > 0 and i < len(chunks):
+                dropped = len(chunks[i])
+                i += 1
+                unwritten -= dropped
+                excess -= dropped
+                self._dropped_bytes += dropped
+        return i, unwritten
+
+    def _report_drops(self):
+        """Logs video shed since the last report, at most once per DROP_LOG_INTERVAL."""
+        now = time.monotonic()
+        if now - self._drop_logged_at < DROP_LOG_INTERVAL:
+            return
+        with self._buf_cond:
+            dropped, self._dropped_bytes = self._dropped_bytes, 0
+        if dropped:
+            self._drop_logged_at = now
+            logger.warning("Dropped %.1f KB of video, ffplay slow", dropped / 1024)
+
+    def _tune_writer_thread(self):
+        """Pins the calling thread to --writer-cpu and raises its priority where permitted.
+        Both calls are per-thread on Linux, so this is skipped on other platforms."""
+        if not sys.platform.startswith('linux'):
+            return
+        if self.args.writer_cpu is not None:
+            try:
+                os.sched_setaffinity(0, {self.args.writer_cpu})
+            except (OSError, ValueError) as e:  # ValueError: negative CPU number
+                logger.warning("Could not pin writer to CPU %d: %s", self.args.writer_cpu, e)
+        try:
+            os.nice(WRITER_NICE)
+        except OSError as e:
+            logger.debug("Writer priority left unchanged: %s", e)
+
+    def _writer_loop(self):
+        """Drains queued video data into ffplay's stdin with one writev per batch."""
+        self._tune_writer_thread()
+        while self.running:
+            with self._buf_cond:
+                # Sleep until data arrives, then batch until full or the window closes
+                while not self._pending and self.running:
+                    self._buf_cond.wait()
+                deadline = time.monotonic() + WRITE_IDLE_FLUSH
+                while self._pending_bytes < self._buf_thresh and self.running:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._buf_cond.wait(remaining)
+                if not self._pending:
+                    continue
+                # O(1) swap so the packet callback is never kept waiting on a copy
+                batch, self._pending = self._pending, collections.deque()
+                gen = self._ffplay_gen
+                self._pending_append = self._pending.append
+                self._pending_bytes = 0
+            chunks = list(batch)
+
+            try:
+                with self._write_lock:
+                    # Checked under the lock: stdin is only closed while holding it
+                    fd = self._ffplay_fd
+                    if fd is None or gen != self._ffplay_gen:
+                        continue  # Queued for a player that has since been replaced
+                    self._writev_all(fd, gen, chunks)
+            except BrokenPipeError:
+                logger.warning("FFplay closed. Tearing down link.")
+                self._stop_ffplay()
+                link = self.server_link
+                if link:
+                    link.teardown()
+            except Exception as e:
+                logger.error("Write error: %s", e)
 
     def _on_link_closed(self, link):
-        logger.warning("Link closed.")
-        self._stop_ffplay()
         with self.lock:
-            self.server_link = None
+            state = self._state
+            if link is not state.link:
+                return  # A superseded link; the current session is unaffected
+            self._state = dataclasses.replace(state, link=None)
+        logger.warning("Link to %s closed.", state.server_id)
+        self._stop_ffplay()
         
         if self.running:
-            logger.info(f"Reconnecting in {self.args.reconnect_delay}s...")
-            threading.Timer(self.args.reconnect_delay, self._start_discovery).start()
+            logger.info("Reconnecting in %ss...", self._reconnect_delay)
+            self._reconnect_wake.set()
+
+    def _reconnect_worker(self):
+        shutdown, wake, delay = self._shutdown, self._reconnect_wake, self._reconnect_delay
+        while not shutdown.is_set():
+            wake.wait()
+            wake.clear()
+            # Wait out the reconnect delay; shutdown cuts it short
+            if shutdown.wait(delay):
+                break
+            if not self.server_link:
+                self._start_discovery()
 
     def _start_discovery(self):
         if not self.running: return
-        with self.lock:
-            if self.server_link: return # Already connected
+        if self.server_link: return # Already connected
         
         # Clear old handler if exists
         if self.announce_handler:
             try:
                 RNS.Transport.deregister_announce_handler(self.announce_handler)
             except Exception as e:
-                logger.debug(f"Failed to deregister previous announce handler: {e}")
+                logger.debug("Failed to deregister previous announce handler: %s", e)
             
         self.announce_handler = ClientAnnounceHandler(
-            aspect_filter=f"{self.args.app_name}.{self.args.aspect}",
+            aspect_filter=self._aspect_filter,
             callback=self._on_server_discovered
         )
         RNS.Transport.register_announce_handler(self.announce_handler)
 
-    def _stats_loop(self):
-        while self.running:
-            time.sleep(5)
-            with self.lock:
-                if self.server_link and self.server_link.status == RNS.Link.ACTIVE:
-                    kb = self.bytes_received / 1024
-                    logger.info(f"Receiving data: {kb:.1f} KB total since connect")
+    def _log_stats(self):
+        self._report_drops()
+
+        link = self.server_link
+        if link and link.status == RNS.Link.ACTIVE:
+            kb = self._bytes_received.value / 1024
+            logger.info("Receiving data: %.1f KB total since connect", kb)
+
+    def _wakeup(self):
+        try:
+            self._wake_w.send(b'\x01')
+        except OSError:
+            pass  # Socket buffer full: a wakeup is already pending
+
+    def _on_signal(self, signum, frame):
+        logger.info("Exiting...")
+        self._shutdown.set()
+
+    def _install_signal_handlers(self):
+        """Routes SIGINT/SIGTERM to the event loop via the wakeup socket.
+        Returns the previous (wakeup_fd, handlers) to restore, or None off the main thread."""
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        prev_fd = signal.set_wakeup_fd(self._wake_w.fileno(), warn_on_full_buffer=False)
+        prev_handlers = {}
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            prev_handlers[sig] = signal.signal(sig, self._on_signal)
+        return prev_fd, prev_handlers
+
+    def _restore_signal_handlers(self, saved):
+        if saved is None:
+            return
+        prev_fd, prev_handlers = saved
+        for sig, handler in prev_handlers.items():
+            signal.signal(sig, handler)
+        signal.set_wakeup_fd(prev_fd)
+
+    def _run_loop(self):
+        """Main-thread event loop: drains ffplay stderr, ticks stats and waits for stop()."""
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        watched = None  # ffplay process whose stderr is registered
+        tail = b''  # Incomplete last stderr line of watched, finished by the next read
+        next_stats = time.monotonic() + STATS_INTERVAL
+        try:
+            while not self._shutdown.is_set():
+                process = self.ffplay_process
+                if process is not watched:
+                    if watched is not None:
+                        self._log_ffplay_line(watched.pid, tail)
+                        self._release_ffplay_stderr(sel, watched)
+                    tail = b''
+                    if process is not None and process.stderr:
+                        sel.register(process.stderr, selectors.EVENT_READ)
+                    watched = process
+
+                for key, _ in sel.select(max(0.0, next_stats - time.monotonic())):
+                    if key.fileobj is self._wake_r:
+                        try:
+                            self._wake_r.recv(4096)
+                        except BlockingIOError:
+                            pass
+                        continue
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        tail = self._log_ffplay_stderr(watched.pid, tail, data)
+                    else:
+                        sel.unregister(key.fileobj)  # EOF; closed once ffplay is replaced
+                        self._log_ffplay_line(watched.pid, tail)
+                        tail = b''
+
+                now = time.monotonic()
+                if now >= next_stats:
+                    next_stats = now + STATS_INTERVAL
+                    self._log_stats()
+        finally:
+            if watched is not None:
+                self._log_ffplay_line(watched.pid, tail)
+                self._release_ffplay_stderr(sel, watched)
+            sel.close()
 
     def start(self):
-        self.running = True
+        self._shutdown.clear()
         self.initialize_rns()
         self._start_discovery()
+
+        # Cached server attempt, racing announce discovery
+        t = threading.Thread(target=self._connect_last_server, name="LastServer", daemon=True)
+        t.start()
         
-        # Stats thread
-        t = threading.Thread(target=self._stats_loop, daemon=True)
+        # FFplay writer thread
+        t = threading.Thread(target=self._writer_loop, name="FFplayWriter", daemon=True)
+        t.start()
+
+        # Reconnect scheduler thread
+        t = threading.Thread(target=self._reconnect_worker, name="Reconnect", daemon=True)
+        t.start()
+
+        # PONG sender thread
+        t = threading.Thread(target=self._pong_sender, name="PongSender", daemon=True)
         t.start()
         
         logger.info("Client Running. Waiting for stream...")
+        saved_signals = self._install_signal_handlers()
         try:
-            while self.running:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            logger.info("Exiting...")
+            self._run_loop()
         finally:
+            self._restore_signal_handlers(saved_signals)
             self.stop()
 
     def stop(self):
-        self.running = False
+        """Stops the client. Workers are released first, then teardown runs in a fixed
+        order: ffplay, the server link, the announce handler, and finally RNS."""
+        self._shutdown.set()
+        self._wakeup()
+        self._reconnect_wake.set()
+        self._pong_wake.set()
+        with self._buf_cond:
+            self._buf_cond.notify()
         with self.lock:
-            if self.server_link:
-                self.server_link.teardown()
             self._stop_ffplay()
+            link = self._state.link
+            if link:
+                link.teardown()
+            handler, self.announce_handler = self.announce_handler, None
+        if handler:
+            try:
+                RNS.Transport.deregister_announce_handler(handler)
+            except Exception as e:
+                logger.debug("Failed to deregister announce handler: %s", e)
         RNS.Reticulum.exit_handler()
 
 if __name__ == "__main__":
@@ -262,8 +760,12 @@ if __name__ == "__main__":
     parser.add_argument('--aspect', default=DEFAULT_ASPECT)
     parser.add_argument('--timeout', type=int, default=30)
     parser.add_argument('--reconnect-delay', type=int, default=5)
+    parser.add_argument('--max-buffer-kb', type=int, default=DEFAULT_MAX_BUFFER_KB,
+                        help="Max video queued for ffplay before dropping oldest data")
+    parser.add_argument('--writer-cpu', type=int, default=None,
+                        help="Pin the ffplay writer thread to this CPU (Linux)")
     
-    args = parser.parse_args()
+    args = ClientArgs(**vars(parser.parse_args()))
     
     client = StreamClient(args)
     client.start()
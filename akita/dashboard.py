@@ -49,10 +49,10 @@ def get_clients():
     
     clients_list = []
     with current_server.lock:
-        for cid, session in current_server.clients.items():
+        for session in current_server.clients.values():
             clients_list.append({
-                "full_id": cid,
-                "id": cid[:12],
+                "full_id": session.link_id,
+                "id": session.link_id[:12],
                 "connected_at": session.connected_at,
                 "bytes_sent": session.bytes_sent
             })
@@ -73,9 +73,11 @@ def control_server(action: str):
 def kick_client(client_id: str):
     if current_server is None: return {"error": "No server"}
     with current_server.lock:
-        if client_id in current_server.clients:
-            current_server.clients[client_id].link.teardown()
-            # It will be removed from the dict on link closed callback
+        for session in current_server.clients.values():
+            if session.link_id == client_id:
+                session.link.teardown()
+                # It will be removed from the dict on link closed callback
+                break
     return {"status": "ok"}
 
 @app.post("/api/settings")
@@ -90,18 +92,11 @@ def update_settings(payload: SettingsPayload):
         json.dump(payload.dict(), f)
     
     if current_server is not None:
-        current_server.settings.res = tuple(map(int, payload.res.split('x')))
-        current_server.settings.fps = payload.fps
-        current_server.settings.max_clients = payload.max_clients
-        # Apply logic
-        if current_server.ffmpeg_process:
-            with current_server.lock:
-                current_server.ffmpeg_process.terminate()
-                try: current_server.ffmpeg_process.wait(2)
-                except: current_server.ffmpeg_process.kill()
-                current_server.ffmpeg_process = None
-                if len(current_server.clients) > 0:
-                    current_server._ensure_ffmpeg_running()
+        current_server.apply_settings(
+            res=tuple(map(int, payload.res.split('x'))),
+            fps=payload.fps,
+            max_clients=payload.max_clients
+        )
 
     return {"status": "saved"}
 
@@ -8,7 +8,9 @@ import platformdirs
 import subprocess
 import threading
 import time
+import heapq
 import os
+import selectors
 import argparse
 import logging
 from dataclasses import dataclass
@@ -24,6 +26,24 @@ PING_MESSAGE = b"__AKITA_ADS_PING__"
 PONG_MESSAGE = b"__AKITA_ADS_PONG__"
 MAX_CLIENTS_MSG = b"MAX_CLIENTS_REACHED"
 
+# Video Encoders
+ENCODERS = ("auto", "libx264", "vaapi", "nvenc")
+VAAPI_DEVICE = "/dev/dri/renderD128"
+NVIDIA_DEVICE = "/dev/nvidia0"
+
+HEARTBEAT_TICK = 2  # Seconds between heartbeat loop passes
+ANNOUNCE_INTERVAL_NS = 120 * 1_000_000_000  # Re-announce period, run from the heartbeat loop
+
+# Stream Fan-out
+TS_PACKET_SIZE = 188
+RING_SIZE = 1 << 22                # 4 MiB of MPEG-TS history shared by all clients (power of two)
+READ_SIZE = TS_PACKET_SIZE * 348   # Max bytes per read from ffmpeg's stdout (65424, < 64 KiB)
+SEND_SIZE = READ_SIZE              # Max bytes per link.send, whole packets only
+# Backlog a slow client may build before its oldest data is dropped: ~1 MiB, about two
+# 2 s GOPs at 2 Mbit/s. Packet-aligned so skipping keeps the client on packet boundaries.
+CLIENT_MAX_LAG = (1 << 20) // TS_PACKET_SIZE * TS_PACKET_SIZE
+DROP_LOG_STEP = 1 << 20            # Warn each time a client's dropped total crosses another MiB
+
 # Logging Config
 logging.basicConfig(
     level=logging.INFO,
@@ -42,20 +62,139 @@ class StreamSettings:
     max_clients: int
     heartbeat_interval: int
     heartbeat_timeout: int
+    ffmpeg_grace: int  # Seconds FFmpeg is kept running after the last client leaves
+
+class TSRingBuffer:
+    """Single-producer, multi-consumer byte ring for the ffmpeg MPEG-TS stream.
+
+    Positions are absolute byte offsets into the stream. Only the producer advances
+    head, and only by whole TS packets, so every cursor stays packet-aligned. Each
+    consumer keeps its own cursor and copies out with read(). A consumer that falls
+    too far behind is snapped forward to the oldest intact packet.
+    """
+    def __init__(self, size=RING_SIZE, max_write=READ_SIZE):
+        if size & (size - 1) or max_write >= size:
+            raise ValueError("Ring size must be a power of two larger than max_write")
+        self.size = size
+        self.buf = bytearray(size)
+        self.head = 0  # Total bytes ever published, a multiple of TS_PACKET_SIZE
+        self.cond = threading.Condition(threading.Lock())  # Notified on every publish
+        self._view = memoryview(self.buf)
+        self._mask = size - 1
+        self._max_write = max_write
+        self._partial = 0  # Bytes of an incomplete packet held past head
+        # Packet-aligned distance a cursor may trail head while the next fill is in progress
+        window = size - max_write - TS_PACKET_SIZE
+        self._window = window - window % TS_PACKET_SIZE
+
+    def fill(self, fd):
+        """Reads up to max_write bytes from fd directly into the ring and publishes the
+        complete packets. Returns the byte count, 0 at EOF. Producer thread only."""
+        pos = (self.head + self._partial) & self._mask
+        first = self.size - pos
+        if first >= self._max_write:
+            n = os.readv(fd, (self._view[pos:pos + self._max_write],))
+        else:
+            n = os.readv(fd, (self._view[pos:], self._view[:self._max_write - first]))
+        if n:
+            total = self._partial + n
+            self._partial = total % TS_PACKET_SIZE
+            if total > self._partial:
+                self._publish(total - self._partial)
+        return n
+
+    def reset(self):
+        """Discards a trailing partial packet, e.g. when a new ffmpeg takes over."""
+        self._partial = 0
+
+    def _publish(self, n):
+        with self.cond:
+            self.head += n
+            self.cond.notify_all()
+
+    def read(self, cursor, limit):
+        """Copies up to limit bytes starting at cursor.
+        Returns (data, next_cursor, skipped), where skipped counts bytes overwritten
+        before this consumer reached them."""
+        skipped = 0
+        while True:
+            head = self.head
+            oldest = head - self._window
+            if cursor < oldest:
+                skipped += oldest - cursor
+                cursor = oldest
+            n = min(head - cursor, limit)
+            pos = cursor & self._mask
+            end = pos + n
+            if end <= self.size:
+                data = self._view[pos:end].tobytes()
+            else:
+                data = self._view[pos:].tobytes() + self._view[:end - self.size].tobytes()
+            # Keep the copy only if the producer did not lap us while it was made
+            if cursor >= self.head - self._window:
+                return data, cursor + n, skipped
 
 class ClientSession:
     """Tracks state for a single connected client."""
-    def __init__(self, link):
+    def __init__(self, link, cursor=0):
         self.link = link
-        self.link_id = RNS.prettyhexrep(link.hash)
-        self.connected_at = time.time()
-        self.last_pong = time.time()
-        self.last_ping = time.time()
+        self.hash_bytes = bytes(link.hash)  # Key in WaylandStreamServer.clients
+        self.link_id = RNS.prettyhexrep(link.hash)  # For logs and the dashboard
+        # Largest payload RNS carries in one packet on this link; sends are pre-split to it
+        self.mdu = getattr(link, 'mdu', None) or getattr(RNS.Link, 'MDU', None) or SEND_SIZE
+        self.connected_at = time.time()  # Wall clock, for display
+        # Heartbeat bookkeeping in time.monotonic_ns(), immune to clock steps
+        self.last_pong = time.monotonic_ns()
         self.bytes_sent = 0
+        self.started = False  # Set once the client has answered a PING, see _start_streaming
+        self.cursor = cursor  # Next stream position to send, see TSRingBuffer
+        self.dropped_bytes = 0
+        self.next_drop_log = 0  # dropped_bytes level that triggers the next warning
+
+def _encoder_works(encoder):
+    """Encodes one small test frame, so a listed encoder without usable hardware is skipped."""
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    if encoder == "vaapi":
+        cmd += ['-vaapi_device', VAAPI_DEVICE]
+    cmd += ['-f', 'lavfi', '-i', 'color=size=256x256:rate=1', '-frames:v', '1']
+    if encoder == "vaapi":
+        cmd += ['-vf', 'format=nv12,hwupload', '-c:v', 'h264_vaapi']
+    else:
+        cmd += ['-c:v', 'h264_nvenc']
+    cmd += ['-f', 'null', '-']
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug("Test encode with %s failed: %s", encoder, e)
+        return False
+    if result.returncode != 0:
+        logger.debug("Test encode with %s failed: %s", encoder,
+                     result.stderr.decode('utf-8', errors='ignore').strip())
+        return False
+    return True
+
+def detect_encoder():
+    """Returns the first H.264 hardware encoder that ffmpeg and this machine both support,
+    falling back to 'libx264'."""
+    try:
+        out = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug("Encoder probe failed: %s", e)
+        return "libx264"
+    if b"h264_vaapi" in out and os.path.exists(VAAPI_DEVICE) and _encoder_works("vaapi"):
+        return "vaapi"
+    if b"h264_nvenc" in out and os.path.exists(NVIDIA_DEVICE) and _encoder_works("nvenc"):
+        return "nvenc"
+    return "libx264"
 
 class WaylandStreamServer:
     def __init__(self, args):
         self.args = args
+        # Resolved once: probing ffmpeg on every (re)start would delay the stream
+        self.encoder = detect_encoder() if args.encoder == "auto" else args.encoder
+        logger.info("Video encoder: %s", self.encoder)
         self.settings = StreamSettings(
             res=self._parse_res(args.res),
             fps=args.fps,
@@ -64,7 +203,8 @@ class WaylandStreamServer:
             preset=args.preset,
             max_clients=args.max_clients,
             heartbeat_interval=args.heartbeat_interval,
-            heartbeat_timeout=args.heartbeat_timeout
+            heartbeat_timeout=args.heartbeat_timeout,
+            ffmpeg_grace=args.ffmpeg_grace
         )
         
         # Load from config.json if it exists
@@ -83,18 +223,42 @@ class WaylandStreamServer:
         except Exception as e:
             logger.error(f"Failed to load config.json: {e}")
         
+        # Derived from settings once; rebuilt by apply_settings()
+        self._ffmpeg_cmd = self._build_ffmpeg_cmd()
+        self._announce_blob = self._build_announce_blob()
+        
         self.rns_identity = None
         self.announce_dest = None
-        self.running = False
+        # Cleared by start() and set by stop(); waiters wake on it instead of polling
+        self._shutdown = threading.Event()
+        self._shutdown.set()
         
         # State Management
         self.lock = threading.RLock()
         self.ffmpeg_process = None
-        self.clients = {} # Map[link_hash_str, ClientSession]
+        self._ffmpeg_gen = 0  # Bumped on every FFmpeg start; readers of older ones stop
+        self.clients = {} # Map[link_hash_bytes, ClientSession]
+        # Read-only copy of clients for lock-free readers; replaced whole under self.lock
+        self._clients_snapshot = {}
+        # Min-heap of (pong_deadline_ns, link_hash_bytes), guarded by self.lock.
+        # Entries go stale as PONGs arrive and are re-checked only once due.
+        self._pong_deadlines = []
+        # ffmpeg output is read once into the ring and fanned out to every client
+        self.ring = TSRingBuffer()
+        self._reader_lock = threading.Lock()  # Keeps the ring single-producer across restarts
         
         # Threads
         self.heartbeat_thread = None
-        self.announce_timer = None
+        self._hb_interval_ns = self.settings.heartbeat_interval * 1_000_000_000
+        self._hb_timeout_ns = self.settings.heartbeat_timeout * 1_000_000_000
+        self._next_announce_ns = 0
+        self._next_ping_ns = 0  # All clients are pinged together, once per heartbeat interval
+        # Idle FFmpeg shutdown, run from the heartbeat loop: (deadline_ns, generation)
+        self._ffmpeg_idle_until = None
+
+    @property
+    def running(self):
+        return not self._shutdown.is_set()
 
     def _parse_res(self, res_str):
         try:
@@ -131,34 +295,95 @@ class WaylandStreamServer:
         logger.info(f"Dest Hash: {RNS.prettyhexrep(self.announce_dest.hash)}")
 
     def _get_ffmpeg_cmd(self):
-        return [
-            'ffmpeg',
-            '-loglevel', 'error',
+        return self._ffmpeg_cmd
+
+    def _build_ffmpeg_cmd(self):
+        w, h = self.settings.res
+        crf = str(self.settings.crf)
+        cmd = ['ffmpeg', '-loglevel', 'error']
+        if self.encoder == "vaapi":
+            cmd += ['-vaapi_device', VAAPI_DEVICE]
+        cmd += [
             '-f', 'pipewire',
             '-framerate', str(self.settings.fps),
             '-i', 'portal',
-            '-vf', f'scale={self.settings.res[0]}:{self.settings.res[1]}',
-            '-c:v', 'libx264',
-            '-preset', self.settings.preset,
-            '-tune', 'zerolatency',
-            '-crf', str(self.settings.crf),
+        ]
+
+        if self.encoder == "vaapi":
+            # Upload once and scale on the GPU; -qp is the closest match to -crf
+            cmd += [
+                '-vf', f'format=nv12,hwupload,scale_vaapi={w}:{h}',
+                '-c:v', 'h264_vaapi',
+                '-qp', crf,
+            ]
+        elif self.encoder == "nvenc":
+            cmd += [
+                '-vf', f'scale={w}:{h}',
+                '-c:v', 'h264_nvenc',
+                '-preset', 'p1',
+                '-tune', 'll',
+                '-cq', crf,
+                '-pix_fmt', 'yuv420p',
+            ]
+        else:
+            cmd += [
+                '-vf', f'scale={w}:{h}',
+                '-c:v', 'libx264',
+                '-preset', self.settings.preset,
+                '-tune', 'zerolatency',
+                '-crf', crf,
+                '-pix_fmt', 'yuv420p',
+            ]
+
+        cmd += [
             '-g', str(self.settings.gop),
-            '-pix_fmt', 'yuv420p',
             '-f', 'mpegts',
             '-'
         ]
+        return tuple(cmd)
+
+    def _build_announce_blob(self):
+        # App Data format: key:value;key:value
+        res = self.settings.res
+        return f"nickname:{self.args.nickname};res:{res[0]}x{res[1]};fps:{self.settings.fps}".encode('utf-8')
+
+    def apply_settings(self, res, fps, max_clients):
+        """Applies new stream settings, restarting FFmpeg if it is running."""
+        with self.lock:
+            self.settings.res = res
+            self.settings.fps = fps
+            self.settings.gop = fps * self.args.gop_seconds
+            self.settings.max_clients = max_clients
+            self._ffmpeg_cmd = self._build_ffmpeg_cmd()
+            self._announce_blob = self._build_announce_blob()
+
+            if self.ffmpeg_process:
+                self.ffmpeg_process.terminate()
+                try: self.ffmpeg_process.wait(2)
+                except: self.ffmpeg_process.kill()
+                self.ffmpeg_process = None
+                if len(self.clients) > 0:
+                    self._ensure_ffmpeg_running()
 
     def _monitor_ffmpeg_stderr(self, process):
         """Reads FFmpeg stderr to log errors."""
+        fd = process.stderr.fileno()
+        tail = b''  # Incomplete last line, finished by the next read
         try:
-            for line in iter(process.stderr.readline, b''):
-                if not line:
+            while True:
+                data = os.read(fd, 65536)
+                if not data:
                     break
-                log_line = line.decode('utf-8', errors='ignore').strip()
-                if log_line:
-                    logger.warning(f"[FFMPEG]: {log_line}")
+                # The pipe is always drained, but skip decoding lines nobody will see
+                if not logger.isEnabledFor(logging.WARNING):
+                    tail = b''
+                    continue
+                *lines, tail = (tail + data).split(b'\n')
+                for line in lines:
+                    self._log_ffmpeg_line(line)
+            self._log_ffmpeg_line(tail)
         except Exception as e:
-            logger.debug(f"FFmpeg stderr monitor error: {e}", exc_info=True)
+            logger.debug("FFmpeg stderr monitor error: %s", e, exc_info=True)
         finally:
             if process.stderr:
                 try:
@@ -166,6 +391,11 @@ class WaylandStreamServer:
                 except Exception:
                     pass
 
+    def _log_ffmpeg_line(self, line):
+        log_line = line.decode('utf-8', errors='ignore').strip()
+        if log_line:
+            logger.warning("[FFMPEG]: %s", log_line)
+
     def _ensure_ffmpeg_running(self):
         """Starts FFmpeg if not running. Must be called under self.lock."""
         if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
@@ -173,28 +403,28 @@ class WaylandStreamServer:
 
         cmd = self._get_ffmpeg_cmd()
         logger.info("Starting FFmpeg (Wayland/PipeWire)...")
-        logger.debug(f"Command: {' '.join(cmd)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Command: %s", ' '.join(cmd))
 
         try:
+            # Unbuffered: both pipes are only ever read by fd with os.readv/os.read.
+            # Own session and no stdin: terminal keys and Ctrl-C never reach ffmpeg,
+            # which is stopped only through terminate() here.
             self.ffmpeg_process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                bufsize=0, close_fds=True, start_new_session=True
             )
+            self._ffmpeg_gen += 1
             
-            # Start stderr monitor and broadcast loop
+            # Start stderr monitor and the single stdout reader
             t = threading.Thread(target=self._monitor_ffmpeg_stderr, args=(self.ffmpeg_process,), daemon=True)
             t.start()
             
-            t2 = threading.Thread(target=self._ffmpeg_broadcast_loop, args=(self.ffmpeg_process,), name="FFmpegBroadcast", daemon=True)
+            t2 = threading.Thread(target=self._ffmpeg_reader_loop, args=(self.ffmpeg_process, self._ffmpeg_gen), name="FFmpegReader", daemon=True)
             t2.start()
             
-            logger.info(f"FFmpeg started (PID: {self.ffmpeg_process.pid}). CHECK FOR PERMISSION DIALOG.")
-            
-            # Give it a moment to fail if permissions denied immediately
-            time.sleep(2.0)
-            if self.ffmpeg_process.poll() is not None:
-                logger.error("FFmpeg died immediately. Permission denied or PipeWire issue.")
-                self.ffmpeg_process = None
-                return False
+            # An immediate failure (e.g. permission denied) surfaces via _on_ffmpeg_exit
+            logger.info("FFmpeg started (PID: %d). CHECK FOR PERMISSION DIALOG.", self.ffmpeg_process.pid)
             return True
         except Exception as e:
             logger.error(f"Failed to start FFmpeg: {e}")
@@ -202,8 +432,31 @@ class WaylandStreamServer:
             return False
 
     def _stop_ffmpeg_if_idle(self):
-        """Stops FFmpeg if no clients are connected. Must be called under self.lock."""
+        """Schedules FFmpeg to stop once it has been idle for the grace period, keeping
+        the capture (and its portal permission) warm for returning clients.
+        Must be called under self.lock."""
         if len(self.clients) == 0 and self.ffmpeg_process:
+            if self.settings.ffmpeg_grace <= 0:
+                self._stop_ffmpeg()
+                return
+            logger.info("No active clients. Stopping FFmpeg in %ds unless a client returns.",
+                        self.settings.ffmpeg_grace)
+            deadline = time.monotonic_ns() + self.settings.ffmpeg_grace * 1_000_000_000
+            self._ffmpeg_idle_until = (deadline, self._ffmpeg_gen)
+
+    def _check_ffmpeg_idle(self, now):
+        """Stops a warm FFmpeg whose grace period has passed with no client returning."""
+        with self.lock:
+            deadline, gen = self._ffmpeg_idle_until
+            if now < deadline:
+                return
+            self._ffmpeg_idle_until = None
+            if len(self.clients) == 0 and gen == self._ffmpeg_gen:
+                self._stop_ffmpeg()
+
+    def _stop_ffmpeg(self):
+        """Stops FFmpeg now. Must be called under self.lock."""
+        if self.ffmpeg_process:
             logger.info("No active clients. Stopping FFmpeg.")
             try:
                 self.ffmpeg_process.terminate()
@@ -221,147 +474,254 @@ class WaylandStreamServer:
         
         with self.lock:
             if self.settings.max_clients > 0 and len(self.clients) >= self.settings.max_clients:
-                logger.warning(f"Rejecting {client_id}: Max clients reached.")
+                logger.warning("Rejecting %s: Max clients reached.", client_id)
                 try:
                     link.send(MAX_CLIENTS_MSG)
                 except Exception as e:
-                    logger.debug(f"Failed to notify client of max-clients: {e}")
+                    logger.debug("Failed to notify client of max-clients: %s", e)
                 finally:
                     link.teardown()
                 return
 
-            logger.info(f"Accepting client: {client_id}")
+            logger.info("Accepting client: %s", client_id)
             session = ClientSession(link)
-            self.clients[RNS.prettyhexrep(link.hash)] = session
+            self.clients[session.hash_bytes] = session
+            self._publish_clients()
+            heapq.heappush(self._pong_deadlines, (session.last_pong + self._hb_timeout_ns, session.hash_bytes))
             
             link.set_packet_callback(self._on_packet)
             link.set_link_closed_callback(self._on_link_closed)
 
+        # Streaming starts on the PONG, once the client has shown it is listening
+        try:
+            link.send(PING_MESSAGE)
+        except Exception as e:
+            logger.debug("Failed to send initial ping to %s: %s", client_id, e)
+
+    def _start_streaming(self, session):
+        """Starts sending the stream to a client, starting FFmpeg on first use."""
+        with self.lock:
+            if session.started or self.clients.get(session.hash_bytes) is not session:
+                return
             if not self._ensure_ffmpeg_running():
-                logger.error(f"Cannot stream to {client_id}: FFmpeg failed to start.")
-                del self.clients[RNS.prettyhexrep(link.hash)]
-                link.teardown()
+                logger.error("Cannot stream to %s: FFmpeg failed to start.", session.link_id[:8])
+                del self.clients[session.hash_bytes]
+                self._publish_clients()
+                session.link.teardown()
+                return
+            session.cursor = self.ring.head  # Join the stream live
+            session.started = True
+        t = threading.Thread(target=self._client_sender, args=(session,),
+                             name=f"Send-{session.link_id[1:9]}", daemon=True)
+        t.start()
+
+    def _publish_clients(self):
+        """Refreshes the lock-free clients snapshot. Must be called under self.lock."""
+        self._clients_snapshot = self.clients.copy()
 
     def _on_packet(self, message, packet):
         if message == PONG_MESSAGE:
-            lid = RNS.prettyhexrep(packet.link.hash)
-            with self.lock:
-                if lid in self.clients:
-                    self.clients[lid].last_pong = time.time()
+            session = self._clients_snapshot.get(packet.link.hash)
+            if session is not None:
+                session.last_pong = time.monotonic_ns()
+                if not session.started:
+                    self._start_streaming(session)
 
     def _on_link_closed(self, link):
-        lid = RNS.prettyhexrep(link.hash)
         with self.lock:
-            if lid in self.clients:
-                logger.info(f"Link closed: {lid[:8]}")
-                del self.clients[lid]
+            session = self.clients.pop(link.hash, None)
+            if session is not None:
+                logger.info("Link closed: %s", session.link_id[:8])
+                self._publish_clients()
             self._stop_ffmpeg_if_idle()
 
-    def _ffmpeg_broadcast_loop(self, process):
-        logger.info("FFmpeg broadcast loop started.")
+    def _ffmpeg_reader_loop(self, process, gen):
+        """Sole reader of ffmpeg's stdout: publishes the stream into the ring.
+        Runs until EOF, stop(), or a newer FFmpeg generation takes over."""
+        fd = process.stdout.fileno()
+        ring = self.ring
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+        # Wait for a replaced ffmpeg's reader to notice the new generation and exit
+        self._reader_lock.acquire()
+        ring.reset()
+        logger.info("FFmpeg reader started.")
         try:
-            while self.running and process.poll() is None:
-                if process.stdout:
-                    chunk = process.stdout.read(4096)
-                    if chunk:
-                        with self.lock:
-                            sessions = list(self.clients.values())
-                        
-                        for session in sessions:
-                            if session.link.status == RNS.Link.ACTIVE:
-                                try:
-                                    session.link.send(chunk)
-                                    session.bytes_sent += len(chunk)
-                                except Exception as e:
-                                    # Link might be closing, ignore
-                                    pass
-                    else:
-                        time.sleep(0.005)
-                else:
-                    time.sleep(0.01)
+            while self.running and self._ffmpeg_gen == gen:
+                # Bounded wait so a stop() is noticed even if ffmpeg goes quiet
+                if not sel.select(timeout=1.0):
+                    continue
+                if not ring.fill(fd):
+                    break  # EOF/HUP: ffmpeg exited
         except Exception as e:
-            logger.error(f"Broadcast loop error: {e}")
+            logger.error("FFmpeg reader error: %s", e)
         finally:
-            logger.info("FFmpeg broadcast loop ended.")
+            self._reader_lock.release()
+            sel.close()
+            logger.info("FFmpeg reader ended.")
+            self._on_ffmpeg_exit(process)
 
-    def _heartbeat_checker(self):
-        while self.running:
-            time.sleep(2)
-            now = time.time()
-            timeout_threshold = now - self.settings.heartbeat_timeout
-            
-            with self.lock:
-                sessions = list(self.clients.values())
-                
-            for session in sessions:
-                # Check timeout
-                if session.last_pong < timeout_threshold:
-                    logger.warning(f"Client {session.link_id[:8]} timed out. Kicking.")
-                    session.link.teardown()
+    def _on_ffmpeg_exit(self, process):
+        """Drops the streaming clients if FFmpeg exited without being stopped."""
+        with self.lock:
+            if not self.running or process is not self.ffmpeg_process:
+                return  # Stopped or replaced on purpose
+            self.ffmpeg_process = None
+            sessions = [s for s in self.clients.values() if s.started]
+        # The reader can also end on an error with ffmpeg still running, so never wait unbounded
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        logger.error("FFmpeg exited (code %s). Permission denied or PipeWire issue.", process.wait())
+        for session in sessions:
+            session.link.teardown()
+
+    def _client_sender(self, session):
+        """Sends newly published stream data to one client from its own cursor.
+        Every client has its own sender, so a link whose sends block only falls
+        behind itself. Runs until the client is removed or stop()."""
+        ring, key, active = self.ring, session.hash_bytes, RNS.Link.ACTIVE
+        has_data = lambda: ring.head != session.cursor or not self.running
+        while self.running and self._clients_snapshot.get(key) is session:
+            with ring.cond:
+                # Woken by every publish and by stop(); the timeout notices removal
+                if not ring.cond.wait_for(has_data, timeout=1.0):
                     continue
-                
-                # Send ping
-                if now - session.last_ping > self.settings.heartbeat_interval:
-                    if session.link.status == RNS.Link.ACTIVE:
-                        try:
-                            session.link.send(PING_MESSAGE)
-                            session.last_ping = now
-                        except Exception:
-                            pass
-
-    def _announce_loop(self):
-        if not self.running: return
-        
-        # App Data format: key:value;key:value
-        app_data = f"nickname:{self.args.nickname};res:{self.settings.res[0]}x{self.settings.res[1]};fps:{self.settings.fps}"
+                head = ring.head
+            if session.link.status != active:
+                break  # Closing; _on_link_closed removes the session
+            self._send_pending(session, head)
+
+    def _send_pending(self, session, head):
+        ring = self.ring
+        # Shed the oldest backlog beyond the per-client cap so the client stays live
+        floor = head - CLIENT_MAX_LAG
+        if session.cursor < floor:
+            self._count_dropped(session, floor - session.cursor)
+            session.cursor = floor
+        send, mdu = session.link.send, session.mdu
+        while session.cursor < head:
+            data, cursor, skipped = ring.read(session.cursor, SEND_SIZE)
+            if skipped:
+                self._count_dropped(session, skipped)
+            try:
+                if len(data) <= mdu:
+                    send(data)
+                else:
+                    for off in range(0, len(data), mdu):
+                        send(data[off:off + mdu])
+            except Exception:
+                # Link might be closing; skip ahead so it does not replay stale data
+                session.cursor = head
+                return
+            session.cursor = cursor
+            session.bytes_sent += len(data)
+
+    def _count_dropped(self, session, n):
+        session.dropped_bytes += n
+        if session.dropped_bytes >= session.next_drop_log:
+            logger.warning("Client %s is too slow: %.1f MB of stream dropped so far.",
+                           session.link_id[:8], session.dropped_bytes / (1 << 20))
+            session.next_drop_log = (session.dropped_bytes // DROP_LOG_STEP + 1) * DROP_LOG_STEP
+
+    def _heartbeat_checker(self):
+        while not self._shutdown.wait(HEARTBEAT_TICK):
+            now = time.monotonic_ns()
+
+            if now >= self._next_announce_ns:
+                self._announce()
+                self._next_announce_ns = now + ANNOUNCE_INTERVAL_NS
+
+            if self._ffmpeg_idle_until is not None:
+                self._check_ffmpeg_idle(now)
+
+            if self._pong_deadlines and self._pong_deadlines[0][0] <= now:
+                self._expire_clients(now)
+
+            if now >= self._next_ping_ns:
+                self._ping_clients()
+                self._next_ping_ns = now + self._hb_interval_ns
+            else:
+                # Streaming starts on the first PONG, so keep nudging new
+                # clients every tick rather than waiting for the next sweep
+                self._ping_clients(unstarted_only=True)
+
+    def _ping_clients(self, unstarted_only=False):
+        active = RNS.Link.ACTIVE
+        for session in self._clients_snapshot.values():
+            if unstarted_only and session.started:
+                continue
+            link = session.link
+            if link.status == active:
+                try:
+                    link.send(PING_MESSAGE)
+                except Exception:
+                    pass
+
+    def _expire_clients(self, now):
+        """Kicks clients whose PONG deadline has passed, visiting only due heap entries."""
+        heap, timeout = self._pong_deadlines, self._hb_timeout_ns
+        expired = []
+        with self.lock:
+            while heap and heap[0][0] <= now:
+                _, key = heapq.heappop(heap)
+                session = self.clients.get(key)
+                if session is None:
+                    continue  # Link already closed
+                deadline = session.last_pong + timeout
+                if deadline <= now:
+                    expired.append(session)
+                    deadline = now + timeout  # Kick again later if the link lingers
+                heapq.heappush(heap, (deadline, key))
+        for session in expired:
+            logger.warning("Client %s timed out. Kicking.", session.link_id[:8])
+            session.link.teardown()
+
+    def _announce(self):
         try:
-            self.announce_dest.announce(app_data.encode('utf-8'))
+            self.announce_dest.announce(self._announce_blob)
             logger.debug("Service Announced")
         except Exception as e:
             logger.error(f"Announce failed: {e}")
 
-        if self.running:
-            self.announce_timer = threading.Timer(120, self._announce_loop)
-            self.announce_timer.daemon = True
-            self.announce_timer.start()
-
     def start(self):
-        self.running = True
+        self._shutdown.clear()
         self.initialize_rns()
         
+        # Initial Announce; the heartbeat loop repeats it every ANNOUNCE_INTERVAL_NS
+        self._announce()
+        self._next_announce_ns = time.monotonic_ns() + ANNOUNCE_INTERVAL_NS
+        
         # Start Heartbeat Checker
         self.heartbeat_thread = threading.Thread(target=self._heartbeat_checker, name="HeartbeatCheck", daemon=True)
         self.heartbeat_thread.start()
-        
-        # Initial Announce
-        self._announce_loop()
-        
+
         logger.info(f"--- {self.args.nickname} Running ---")
         try:
-            while self.running:
-                time.sleep(1)
+            self._shutdown.wait()
         except KeyboardInterrupt:
             logger.info("Stopping...")
         finally:
             self.stop()
 
     def stop(self):
-        self.running = False
+        self._shutdown.set()
         logger.info("Shutting down resources...")
+        with self.ring.cond:
+            self.ring.cond.notify_all()
         
         with self.lock:
-            # Copy list to iterate
-            sessions = list(self.clients.values())
-            for sess in sessions:
+            # The snapshot is never mutated, so teardown callbacks can't disturb iteration
+            for sess in self._clients_snapshot.values():
                 sess.link.teardown()
             
             if self.ffmpeg_process:
                 self.ffmpeg_process.terminate()
                 try: self.ffmpeg_process.wait(2)
                 except: self.ffmpeg_process.kill()
-
-        if self.announce_timer:
-            self.announce_timer.cancel()
         
         RNS.Reticulum.exit_handler()
         logger.info("Shutdown complete.")
@@ -376,9 +736,13 @@ if __name__ == "__main__":
     parser.add_argument('--crf', type=int, default=28)
     parser.add_argument('--gop-seconds', type=int, default=2)
     parser.add_argument('--preset', default="ultrafast")
+    parser.add_argument('--encoder', choices=ENCODERS, default="auto",
+                        help="H.264 encoder; auto picks VAAPI or NVENC when available")
     parser.add_argument('--max-clients', type=int, default=DEFAULT_MAX_CLIENTS)
     parser.add_argument('--heartbeat-interval', type=int, default=15)
     parser.add_argument('--heartbeat-timeout', type=int, default=45)
+    parser.add_argument('--ffmpeg-grace', type=int, default=30,
+                        help="Seconds to keep FFmpeg running after the last client leaves (0 = stop at once)")
     
     args = parser.parse_args()
     